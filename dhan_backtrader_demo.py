@@ -7,7 +7,7 @@ This demonstrates paper trading using Dhan Sandbox API with Backtrader
 import backtrader as bt
 import sys
 from datetime import datetime
-from dhan_config import DHAN_CONFIG, TRADING_CONFIG, STRATEGY_CONFIG, print_config
+from dhan_config import TRADING_CONFIG, STRATEGY_CONFIG, print_config, get_dhan_client
 from dhan_broker import DhanBroker
 from dhan_data_feed import DhanData
 
@@ -282,7 +282,7 @@ def run_dhan_backtrader_demo():
     except Exception as e:
         print(f"\n❌ Demo failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
 def test_dhan_connection():
@@ -290,12 +290,7 @@ def test_dhan_connection():
     print("🔍 Testing Dhan API Connection...")
     
     try:
-        from dhanhq import dhanhq
-        
-        dhan = dhanhq(
-            client_id=DHAN_CONFIG['client_id'],
-            access_token=DHAN_CONFIG['access_token']
-        )
+        dhan = get_dhan_client()
         
         response = dhan.get_fund_limits()
         
@@ -337,4 +332,4 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"\n❌ Demo crashed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
\ No newline at end of file
+        traceback.print_exc()
\ No newline at end of file
@@ -2,8 +2,7 @@ import backtrader as bt
 import requests
 import json
 from datetime import datetime
-from dhan_config import DHAN_CONFIG, TRADING_CONFIG, get_dhan_headers
-from dhanhq import dhanhq
+from dhan_config import DHAN_CONFIG, TRADING_CONFIG, get_dhan_headers, get_dhan_client
 
 class DhanBroker(bt.BrokerBase):
     """
@@ -15,10 +14,7 @@ class DhanBroker(bt.BrokerBase):
         super(DhanBroker, self).__init__()
         
         # Initialize Dhan client
-        self.dhan = dhanhq(
-            client_id=DHAN_CONFIG['client_id'],
-            access_token=DHAN_CONFIG['access_token']
-        )
+        self.dhan = get_dhan_client()
         
         # Portfolio tracking
         self.cash = TRADING_CONFIG['initial_cash']
@@ -69,6 +69,27 @@ DHAN_ENDPOINTS = {
     'live_feeds': f"{DHAN_CONFIG['base_url']}/marketfeed/ltp"
 }
 
+# Connection pool for the shared SDK client (requests HTTPAdapter arguments)
+HTTP_POOL_CONFIG = {
+    'pool_connections': 20,
+    'pool_maxsize': 20,
+    'max_retries': 1
+}
+
+_dhan_client = None
+
+def get_dhan_client():
+    """Shared dhanhq client - one keep-alive HTTP session for all API calls"""
+    global _dhan_client
+    if _dhan_client is None:
+        from dhanhq import dhanhq
+        _dhan_client = dhanhq(
+            client_id=DHAN_CONFIG['client_id'],
+            access_token=DHAN_CONFIG['access_token'],
+            pool=HTTP_POOL_CONFIG
+        )
+    return _dhan_client
+
 def get_dhan_headers():
     """Get headers for Dhan API requests"""
     return {
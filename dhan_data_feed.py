@@ -2,8 +2,7 @@ import backtrader as bt
 import pandas as pd
 import requests
 from datetime import datetime, timedelta
-from dhan_config import DHAN_CONFIG, DATA_CONFIG, TRADING_SYMBOLS, get_dhan_headers
-from dhanhq import dhanhq
+from dhan_config import DATA_CONFIG, TRADING_SYMBOLS, get_dhan_headers, get_dhan_client
 
 class DhanData(bt.feeds.PandasData):
     """
@@ -21,10 +20,7 @@ class DhanData(bt.feeds.PandasData):
     
     def __init__(self):
         # Initialize Dhan client
-        self.dhan = dhanhq(
-            client_id=DHAN_CONFIG['client_id'],
-            access_token=DHAN_CONFIG['access_token']
-        )
+        self.dhan = get_dhan_client()
         
         self.symbol_info = None
         self.data_loaded = False
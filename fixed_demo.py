@@ -226,7 +226,7 @@ def run_fixed_demo():
     except Exception as e:
         print(f"Demo failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Indicator kernels with an ahead-of-time Numba build
+Run `python indicators_aot.py` once to compile them into the zerodha_indicators
+extension, so strategies skip the JIT compile on their first backtest
+"""
+
+import numpy as np
+from numba_compat import njit
+
+# Bump whenever a kernel changes - zerodha_broker ignores builds of older kernels
+KERNEL_VERSION = 2
+
+def kernel_version():
+    """Kernel version compiled into this build"""
+    return KERNEL_VERSION
+
+@njit(cache=True)
+def window_fsum(values, lo, hi, partials):
+    """
+    Correctly rounded sum of values[lo:hi], the same algorithm as math.fsum
+    Backtrader's SMA uses fsum, so equal windows give bit-identical averages -
+    a running total would drift and turn exact MA ties into spurious crosses.
+    partials is scratch space with at least hi - lo slots.
+    """
+    count = 0
+    for k in range(lo, hi):
+        x = values[k]
+        j = 0
+        for m in range(count):
+            y = partials[m]
+            if abs(x) < abs(y):
+                x, y = y, x
+            high = x + y
+            low = y - (high - x)
+            if low != 0.0:
+                partials[j] = low
+                j += 1
+            x = high
+        partials[j] = x
+        count = j + 1
+    
+    # Add the partials from the top, then fix a half-way rounding case
+    if count == 0:
+        return 0.0
+    count -= 1
+    high = partials[count]
+    low = 0.0
+    while count > 0:
+        x = high
+        y = partials[count - 1]
+        count -= 1
+        high = x + y
+        low = y - (high - x)
+        if low != 0.0:
+            break
+    if count > 0 and ((low < 0.0 and partials[count - 1] < 0.0) or
+                      (low > 0.0 and partials[count - 1] > 0.0)):
+        y = low * 2.0
+        x = high + y
+        if y == x - high:
+            high = x
+    return high
+
+def sma_crossover(close, fast, slow):
+    """Fast/slow SMAs and a +1/-1 crossover signal in one pass, matching Backtrader's CrossOver"""
+    n = close.shape[0]
+    fast_ma = np.full(n, np.nan)
+    slow_ma = np.full(n, np.nan)
+    crossover = np.zeros(n, dtype=np.int8)
+    partials = np.empty(max(fast, slow))
+    start = max(fast, slow) - 1
+    last_diff = 0.0  # last non-zero fast - slow difference
+    for i in range(n):
+        if i >= fast - 1:
+            fast_ma[i] = window_fsum(close, i - fast + 1, i + 1, partials) / fast
+        if i >= slow - 1:
+            slow_ma[i] = window_fsum(close, i - slow + 1, i + 1, partials) / slow
+        if i >= start:
+            diff = fast_ma[i] - slow_ma[i]
+            if i > start:
+                if last_diff < 0.0 and diff > 0.0:
+                    crossover[i] = 1
+                elif last_diff > 0.0 and diff < 0.0:
+                    crossover[i] = -1
+            if diff != 0.0 or i == start:
+                last_diff = diff
+    return fast_ma, slow_ma, crossover
+
+if __name__ == '__main__':
+    from numba.pycc import CC
+    
+    cc = CC('zerodha_indicators')
+    cc.export('kernel_version', 'i8()')(kernel_version)
+    cc.export('sma_crossover', 'Tuple((f8[:], f8[:], i1[:]))(f8[:], i8, i8)')(sma_crossover)
+    cc.compile()
+    print(f"Built {cc.output_file}")
@@ -484,7 +484,7 @@ def run_live_paper_trading():
     except Exception as e:
         print(f"\nPaper trading failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
 if __name__ == '__main__':
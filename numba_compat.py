@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Optional Numba support - njit compiles when numba is installed, plain Python otherwise
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
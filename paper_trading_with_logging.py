@@ -542,7 +542,7 @@ def run_enhanced_paper_trading():
     except Exception as e:
         print(f"\nPaper trading failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
 if __name__ == '__main__':
@@ -4,23 +4,107 @@ Simple Trading Dashboard - Reads your existing log files
 Works seamlessly with your enhanced_fixed_demo.py
 """
 
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 import pandas as pd
 import json
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 import threading
 import time
 
+# Optional: columnar trade logs (trading_logs/parquet/date=YYYYMMDD/)
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_ds
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Optional: faster JSON encoding for /api/data
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 86400  # static/dashboard.css, static/dashboard.js
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
+# Only the trade log columns the dashboard actually displays
+TRADE_COLUMNS = ['timestamp', 'symbol', 'action', 'quantity', 'price', 'commission', 'pnl']
+
+LOG_DIR = Path("trading_logs")
+
+# Today's log file paths - rebuilt only when the date rolls over
+_day_cache = {'date': None, 'today': None, 'trade': None, 'parquet': None, 'portfolio': None}
+
+def get_log_paths():
+    """Return the cached log paths for today"""
+    date = datetime.now().date()
+    if date != _day_cache['date']:
+        today = date.strftime('%Y%m%d')
+        _day_cache.update(
+            date=date,
+            today=today,
+            trade=LOG_DIR / f"trades_{today}.csv",
+            parquet=LOG_DIR / "parquet" / f"date={today}",
+            portfolio=LOG_DIR / f"portfolio_{today}.json"
+        )
+    return _day_cache
+
+def load_parquet_trades(today):
+    """Read today's trades from the partitioned Parquet log, or None if unavailable"""
+    parquet_dir = LOG_DIR / "parquet"
+    if not PARQUET_AVAILABLE or not parquet_dir.exists():
+        return None
+    
+    partitioning = pa_ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    dataset = pa_ds.dataset(parquet_dir, format='parquet', partitioning=partitioning)
+    table = dataset.to_table(columns=TRADE_COLUMNS, filter=(pa_ds.field('date') == today))
+    if table.num_rows == 0:
+        return None
+    return table.to_pandas()
+
+def load_trades(paths):
+    """Read today's trades - prefer the Parquet log, fall back to the CSV"""
+    try:
+        trades_df = load_parquet_trades(paths['today'])
+        if trades_df is not None:
+            return trades_df
+    except Exception as e:
+        print(f"Error reading parquet trades: {e}")
+    
+    if paths['trade'].exists():
+        return pd.read_csv(paths['trade'], usecols=TRADE_COLUMNS)
+    return None
+
+def trades_signature(paths):
+    """Modification times of today's trade logs - changes whenever a trade is written"""
+    signature = []
+    for path in (paths['trade'], paths['parquet']):
+        try:
+            signature.append(path.stat().st_mtime_ns)
+        except OSError:
+            signature.append(0)
+    return tuple(signature)
 
 def get_latest_data():
     """Read latest trading data from your log files"""
-    log_dir = Path("trading_logs")
-    today = datetime.now().strftime('%Y%m%d')
-    
-    trade_file = log_dir / f"trades_{today}.csv"
-    portfolio_file = log_dir / f"portfolio_{today}.json"
+    paths = get_log_paths()
+    portfolio_file = paths['portfolio']
     
     data = {
         'current_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -30,25 +114,22 @@ def get_latest_data():
     }
     
     # Read trades
-    if trade_file.exists():
-        try:
-            trades_df = pd.read_csv(trade_file)
+    try:
+        trades_df = load_trades(paths)
+        if trades_df is not None:
             data['trades'] = trades_df.tail(10).to_dict('records')  # Last 10 trades
             
-            # Calculate summary stats
-            total_trades = len(trades_df)
-            buy_trades = len(trades_df[trades_df['action'] == 'BUY'])
-            sell_trades = len(trades_df[trades_df['action'] == 'SELL'])
-            total_pnl = trades_df['pnl'].sum()
+            # Calculate summary stats - one pass over 'action' for both counts
+            action_counts = trades_df['action'].value_counts()
             
             data['summary'] = {
-                'total_trades': total_trades,
-                'buy_trades': buy_trades,
-                'sell_trades': sell_trades,
-                'total_pnl': total_pnl
+                'total_trades': len(trades_df),
+                'buy_trades': int(action_counts.get('BUY', 0)),
+                'sell_trades': int(action_counts.get('SELL', 0)),
+                'total_pnl': float(trades_df['pnl'].sum())
             }
-        except Exception as e:
-            print(f"Error reading trades: {e}")
+    except Exception as e:
+        print(f"Error reading trades: {e}")
     
     # Read portfolio
     if portfolio_file.exists():
@@ -70,26 +151,8 @@ DASHBOARD_HTML = '''
 <html>
 <head>
     <title>Trading Dashboard</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }
-        .container { max-width: 1200px; margin: 0 auto; }
-        .header { background: white; padding: 20px; border-radius: 8px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-        .cards { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; margin-bottom: 20px; }
-        .card { background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
-        .card h3 { margin-top: 0; color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px; }
-        .metric { display: flex; justify-content: space-between; margin: 10px 0; }
-        .metric-label { color: #666; }
-        .metric-value { font-weight: bold; }
-        .positive { color: #28a745; }
-        .negative { color: #dc3545; }
-        .trade-item { background: #f8f9fa; padding: 10px; margin: 5px 0; border-radius: 4px; border-left: 4px solid #007bff; }
-        .trade-item.buy { border-left-color: #28a745; }
-        .trade-item.sell { border-left-color: #dc3545; }
-        .status { display: inline-block; padding: 4px 8px; border-radius: 12px; font-size: 12px; font-weight: bold; }
-        .status.running { background: #28a745; color: white; }
-        .status.stopped { background: #6c757d; color: white; }
-        .refresh-info { text-align: center; margin-top: 20px; color: #666; font-size: 12px; }
-    </style>
+    <script src="https://unpkg.com/htmx.org@1.9.12"></script>
+    <link rel="stylesheet" href="/static/dashboard.css">
 </head>
 <body>
     <div class="container">
@@ -168,7 +231,7 @@ DASHBOARD_HTML = '''
         <!-- Recent Trades -->
         <div class="card">
             <h3>💼 Recent Trades</h3>
-            <div id="recent-trades">
+            <div id="recent-trades" hx-get="/api/trades.html" hx-trigger="load, every 5s [!document.hidden]" hx-swap="innerHTML">
                 <div style="text-align: center; color: #666; padding: 20px;">
                     No trades yet - run enhanced_fixed_demo.py to start trading
                 </div>
@@ -180,110 +243,76 @@ DASHBOARD_HTML = '''
         </div>
     </div>
     
-    <script>
-        function updateDashboard() {
-            fetch('/api/data')
-                .then(response => response.json())
-                .then(data => {
-                    // Update portfolio
-                    if (data.portfolio.total_value) {
-                        document.getElementById('total-value').textContent = '₹' + data.portfolio.total_value.toLocaleString('en-IN', {minimumFractionDigits: 2});
-                        document.getElementById('cash').textContent = '₹' + data.portfolio.cash.toLocaleString('en-IN', {minimumFractionDigits: 2});
-                        
-                        const totalPnl = data.portfolio.total_pnl || 0;
-                        const pnlElement = document.getElementById('total-pnl');
-                        pnlElement.textContent = '₹' + totalPnl.toLocaleString('en-IN', {minimumFractionDigits: 2});
-                        pnlElement.className = 'metric-value ' + (totalPnl > 0 ? 'positive' : totalPnl < 0 ? 'negative' : '');
-                        
-                        const portfolioTime = new Date(data.portfolio.timestamp).toLocaleTimeString();
-                        document.getElementById('portfolio-time').textContent = portfolioTime;
-                    }
-                    
-                    // Update trading summary
-                    if (data.summary.total_trades !== undefined) {
-                        document.getElementById('total-trades').textContent = data.summary.total_trades;
-                        document.getElementById('buy-trades').textContent = data.summary.buy_trades;
-                        document.getElementById('sell-trades').textContent = data.summary.sell_trades;
-                        
-                        const sessionPnl = data.summary.total_pnl || 0;
-                        const sessionPnlElement = document.getElementById('session-pnl');
-                        sessionPnlElement.textContent = '₹' + sessionPnl.toLocaleString('en-IN', {minimumFractionDigits: 2});
-                        sessionPnlElement.className = 'metric-value ' + (sessionPnl > 0 ? 'positive' : sessionPnl < 0 ? 'negative' : '');
-                    }
-                    
-                    // Update system info
-                    document.getElementById('current-time').textContent = data.current_time;
-                    document.getElementById('last-updated').textContent = new Date().toLocaleTimeString();
-                    
-                    // Update recent trades
-                    updateRecentTrades(data.trades);
-                    
-                    // Update status
-                    const statusElement = document.getElementById('status');
-                    if (data.trades.length > 0) {
-                        statusElement.textContent = 'Trading Active';
-                        statusElement.className = 'status running';
-                    } else {
-                        statusElement.textContent = 'Waiting for Trades';
-                        statusElement.className = 'status stopped';
-                    }
-                })
-                .catch(error => {
-                    console.error('Error updating dashboard:', error);
-                    document.getElementById('status').textContent = 'Connection Error';
-                    document.getElementById('status').className = 'status stopped';
-                });
-        }
-        
-        function updateRecentTrades(trades) {
-            const container = document.getElementById('recent-trades');
-            
-            if (!trades || trades.length === 0) {
-                container.innerHTML = '<div style="text-align: center; color: #666; padding: 20px;">No trades yet - run enhanced_fixed_demo.py to start trading</div>';
-                return;
-            }
-            
-            container.innerHTML = trades.reverse().map(trade => {
-                const timestamp = new Date(trade.timestamp).toLocaleTimeString();
-                const action = trade.action.toLowerCase();
-                const pnl = trade.pnl || 0;
-                const pnlClass = pnl > 0 ? 'positive' : pnl < 0 ? 'negative' : '';
-                
-                return `
-                    <div class="trade-item ${action}">
-                        <div style="display: flex; justify-content: space-between;">
-                            <div>
-                                <strong>${trade.action} ${trade.quantity} ${trade.symbol}</strong><br>
-                                <small>@ ₹${(trade.price || 0).toFixed(2)} | ${timestamp}</small>
-                            </div>
-                            <div style="text-align: right;">
-                                <div class="${pnlClass}">₹${pnl.toFixed(2)}</div>
-                                <small>Comm: ₹${(trade.commission || 0).toFixed(2)}</small>
-                            </div>
-                        </div>
-                    </div>
-                `;
-            }).join('');
-        }
-        
-        // Initialize and auto-refresh
-        updateDashboard();
-        setInterval(updateDashboard, 5000);
-    </script>
+    <script src="/static/dashboard.js"></script>
 </body>
 </html>
 '''
 
+# Recent trades partial - rendered server-side and swapped in by htmx
+TRADES_HTML = '''
+{% for trade in trades %}
+<div class="trade-item {{ trade.action|lower }}">
+    <div style="display: flex; justify-content: space-between;">
+        <div>
+            <strong>{{ trade.action }} {{ trade.quantity }} {{ trade.symbol }}</strong><br>
+            <small>@ ₹{{ '%.2f'|format(trade.price or 0) }} | {{ trade.time }}</small>
+        </div>
+        <div style="text-align: right;">
+            <div class="{{ 'positive' if trade.pnl > 0 else 'negative' if trade.pnl < 0 else '' }}">₹{{ '%.2f'|format(trade.pnl or 0) }}</div>
+            <small>Comm: ₹{{ '%.2f'|format(trade.commission or 0) }}</small>
+        </div>
+    </div>
+</div>
+{% else %}
+<div style="text-align: center; color: #666; padding: 20px;">
+    No trades yet - run enhanced_fixed_demo.py to start trading
+</div>
+{% endfor %}
+'''
+
+_TRADES_TEMPLATE = app.jinja_env.from_string(TRADES_HTML)
+
+@lru_cache(maxsize=1)
+def render_recent_trades(today, signature):
+    """Render the recent trades fragment - re-rendered only when the trade log changes"""
+    trades = []
+    try:
+        trades_df = load_trades(get_log_paths())
+        if trades_df is not None:
+            trades = trades_df.tail(10).iloc[::-1].to_dict('records')  # Newest first
+            for trade in trades:
+                trade['time'] = str(trade['timestamp'])[11:19]
+    except Exception as e:
+        print(f"Error reading trades: {e}")
+    
+    return _TRADES_TEMPLATE.render(trades=trades)
+
+# The page has no template variables, so build the response once at import
+# instead of running it through Jinja on every request
+_DASHBOARD_RESPONSE = Response(DASHBOARD_HTML, mimetype='text/html')
+_DASHBOARD_RESPONSE.headers['Cache-Control'] = 'public, max-age=60'
+
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
-    return render_template_string(DASHBOARD_HTML)
+    return _DASHBOARD_RESPONSE
 
 @app.route('/api/data')
 def api_data():
     """API endpoint for dashboard data"""
     return jsonify(get_latest_data())
 
+@app.route('/api/trades.html')
+def api_trades_html():
+    """Recent trades as a cached HTML fragment"""
+    paths = get_log_paths()
+    today = paths['today']
+    signature = trades_signature(paths)
+    
+    response = Response(render_recent_trades(today, signature), mimetype='text/html')
+    response.set_etag(f"{today}-{'-'.join(map(str, signature))}")
+    return response.make_conditional(request)
+
 def run_dashboard_server():
     """Run the dashboard server"""
     print("🌐 Starting Trading Dashboard...")
@@ -0,0 +1,77 @@
+let controller = null;
+
+function renderDashboard(data) {
+    // Update portfolio
+    if (data.portfolio.total_value) {
+        document.getElementById('total-value').textContent = '₹' + data.portfolio.total_value.toLocaleString('en-IN', {minimumFractionDigits: 2});
+        document.getElementById('cash').textContent = '₹' + data.portfolio.cash.toLocaleString('en-IN', {minimumFractionDigits: 2});
+        
+        const totalPnl = data.portfolio.total_pnl || 0;
+        const pnlElement = document.getElementById('total-pnl');
+        pnlElement.textContent = '₹' + totalPnl.toLocaleString('en-IN', {minimumFractionDigits: 2});
+        pnlElement.className = 'metric-value ' + (totalPnl > 0 ? 'positive' : totalPnl < 0 ? 'negative' : '');
+        
+        const portfolioTime = new Date(data.portfolio.timestamp).toLocaleTimeString();
+        document.getElementById('portfolio-time').textContent = portfolioTime;
+    }
+    
+    // Update trading summary
+    if (data.summary.total_trades !== undefined) {
+        document.getElementById('total-trades').textContent = data.summary.total_trades;
+        document.getElementById('buy-trades').textContent = data.summary.buy_trades;
+        document.getElementById('sell-trades').textContent = data.summary.sell_trades;
+        
+        const sessionPnl = data.summary.total_pnl || 0;
+        const sessionPnlElement = document.getElementById('session-pnl');
+        sessionPnlElement.textContent = '₹' + sessionPnl.toLocaleString('en-IN', {minimumFractionDigits: 2});
+        sessionPnlElement.className = 'metric-value ' + (sessionPnl > 0 ? 'positive' : sessionPnl < 0 ? 'negative' : '');
+    }
+    
+    // Update system info
+    document.getElementById('current-time').textContent = data.current_time;
+    document.getElementById('last-updated').textContent = new Date().toLocaleTimeString();
+    
+    // Update status
+    const statusElement = document.getElementById('status');
+    if (data.trades.length > 0) {
+        statusElement.textContent = 'Trading Active';
+        statusElement.className = 'status running';
+    } else {
+        statusElement.textContent = 'Waiting for Trades';
+        statusElement.className = 'status stopped';
+    }
+}
+
+async function updateDashboard() {
+    // No polling while the tab is in the background
+    if (document.hidden) {
+        return;
+    }
+    
+    // Drop any request still in flight so only the freshest response renders
+    if (controller) {
+        controller.abort();
+    }
+    controller = new AbortController();
+    
+    try {
+        const response = await fetch('/api/data', {signal: controller.signal});
+        renderDashboard(await response.json());
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            return;
+        }
+        console.error('Error updating dashboard:', error);
+        document.getElementById('status').textContent = 'Connection Error';
+        document.getElementById('status').className = 'status stopped';
+    }
+}
+
+// Initialize and auto-refresh
+updateDashboard();
+setInterval(updateDashboard, 5000);
+document.addEventListener('visibilitychange', () => {
+    if (!document.hidden) {
+        updateDashboard();
+    }
+});
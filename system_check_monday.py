@@ -4,11 +4,17 @@ Complete System Check & Monday Morning Preparation
 Tests your existing setup and prepares for live trading
 """
 
+import os
 import subprocess
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
+from importlib.metadata import version, PackageNotFoundError
+
+# Market hours as minutes since midnight (9:15 AM - 3:30 PM IST)
+MARKET_OPEN_MINUTES = 9 * 60 + 15
+MARKET_CLOSE_MINUTES = 15 * 60 + 30
 
 def check_files():
     """Check if all your existing files are present"""
@@ -23,10 +29,13 @@ def check_files():
         'live_paper_trading.py': 'Live trading script'
     }
     
+    # One directory scan instead of a stat() per file
+    with os.scandir('.') as entries:
+        present = {entry.name for entry in entries if entry.is_file()}
+    
     files_status = {}
     for file, description in required_files.items():
-        file_path = Path(file)
-        if file_path.exists():
+        if file in present:
             print(f"✅ {file} - {description}")
             files_status[file] = True
         else:
@@ -93,12 +102,14 @@ def check_packages():
         ('flask', 'Web dashboard framework')
     ]
     
+    # Read installed package metadata instead of importing - the lookup
+    # never executes the packages' own code
     all_good = True
     for package, description in packages:
         try:
-            __import__(package)
-            print(f"✅ {package} - {description}")
-        except ImportError:
+            package_version = version(package)
+            print(f"✅ {package} {package_version} - {description}")
+        except PackageNotFoundError:
             print(f"❌ {package} - Missing: {description}")
             all_good = False
     
@@ -165,9 +176,8 @@ def check_market_status():
     is_weekday = now.weekday() < 5  # 0-4 are Mon-Fri
     
     # Check market hours (9:15 AM to 3:30 PM IST)
-    market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-    market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-    is_market_hours = market_open <= now <= market_close
+    minutes = now.hour * 60 + now.minute
+    is_market_hours = MARKET_OPEN_MINUTES <= minutes <= MARKET_CLOSE_MINUTES
     
     print(f"📅 Current time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"📅 Day of week: {now.strftime('%A')}")
@@ -181,7 +191,8 @@ def check_market_status():
         print("✅ Market is OPEN (9:15 AM - 3:30 PM)")
         print("🚀 Perfect time for live trading!")
     elif is_weekday:
-        if now < market_open:
+        if minutes < MARKET_OPEN_MINUTES:
+            market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
             print(f"⏰ Market opens in: {market_open - now}")
         else:
             print(f"🔒 Market closed - opens tomorrow at 9:15 AM")
@@ -4,8 +4,34 @@ Test Dhan + Backtrader Integration Setup
 Run this first to verify everything is working
 """
 
+import importlib.util
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+# Project modules are resolved once here; each test reports its own failure
+try:
+    from dhan_config import DHAN_CONFIG, TRADING_CONFIG, print_config, get_dhan_client
+    CONFIG_IMPORT_ERROR = None
+except Exception as e:
+    CONFIG_IMPORT_ERROR = e
+
+# Availability probe only - the client itself comes from get_dhan_client()
+if importlib.util.find_spec('dhanhq') is not None:
+    DHANHQ_IMPORT_ERROR = None
+else:
+    DHANHQ_IMPORT_ERROR = ImportError("No module named 'dhanhq'")
+
+try:
+    from dhan_broker import DhanBroker
+    from dhan_data_feed import DhanData
+    COMPONENTS_IMPORT_ERROR = None
+except Exception as e:
+    COMPONENTS_IMPORT_ERROR = e
+
+# Fund fields reported by test_dhan_api
+_fund_keys = itemgetter('availablecash', 'utilisedmargin')
 
 def test_imports():
     """Test if all required packages are available"""
@@ -13,20 +39,20 @@ def test_imports():
     print("-" * 40)
     
     packages = [
-        ("Backtrader", "import backtrader as bt"),
-        ("Dhan SDK", "from dhanhq import dhanhq"),
-        ("Pandas", "import pandas as pd"),
-        ("NumPy", "import numpy as np"),
-        ("Requests", "import requests"),
+        ("Backtrader", "backtrader"),
+        ("Dhan SDK", "dhanhq"),
+        ("Pandas", "pandas"),
+        ("NumPy", "numpy"),
+        ("Requests", "requests"),
     ]
     
+    # Only locate each module - don't execute it
     all_good = True
-    for name, import_statement in packages:
-        try:
-            exec(import_statement)
+    for name, module in packages:
+        if importlib.util.find_spec(module) is not None:
             print(f"✅ {name} - Available")
-        except ImportError as e:
-            print(f"❌ {name} - Missing: {e}")
+        else:
+            print(f"❌ {name} - Missing: No module named '{module}'")
             all_good = False
     
     return all_good
@@ -37,7 +63,8 @@ def test_config():
     print("-" * 40)
     
     try:
-        from dhan_config import DHAN_CONFIG, TRADING_CONFIG, print_config
+        if CONFIG_IMPORT_ERROR:
+            raise CONFIG_IMPORT_ERROR
         print("✅ Configuration loaded successfully")
         
         # Check essential config
@@ -53,34 +80,39 @@ def test_config():
         print(f"❌ Configuration error: {e}")
         return False
 
-def test_dhan_api():
-    """Test Dhan API connection"""
+def test_dhan_api(fund_limits=None):
+    """
+    Test Dhan API connection
+    fund_limits: optional Future of a get_fund_limits() call already in flight
+    """
     print("\n🔗 Testing Dhan API Connection")
     print("-" * 40)
     
     try:
-        from dhanhq import dhanhq
-        from dhan_config import DHAN_CONFIG
+        if CONFIG_IMPORT_ERROR or DHANHQ_IMPORT_ERROR:
+            raise CONFIG_IMPORT_ERROR or DHANHQ_IMPORT_ERROR
         
-        dhan = dhanhq(
-            client_id=DHAN_CONFIG['client_id'],
-            access_token=DHAN_CONFIG['access_token']
-        )
+        dhan = get_dhan_client()
         
         print(f"   Client ID: {DHAN_CONFIG['client_id']}")
         print(f"   Base URL: {DHAN_CONFIG['base_url']}")
         
         # Test API call
-        response = dhan.get_fund_limits()
+        if fund_limits is not None:
+            response = fund_limits.result()
+        else:
+            response = dhan.get_fund_limits()
         
         if response and response.get('status') == 'success':
             print("✅ Dhan API connection successful")
             
             # Print fund details if available
-            if 'data' in response:
-                funds = response['data']
-                print(f"   Available Funds: ₹{funds.get('availablecash', 'N/A')}")
-                print(f"   Used Margin: ₹{funds.get('utilisedmargin', 'N/A')}")
+            try:
+                cash, used = _fund_keys(response['data'])
+            except KeyError:
+                cash = used = 'N/A'
+            print(f"   Available Funds: ₹{cash}")
+            print(f"   Used Margin: ₹{used}")
             
             return True
         else:
@@ -98,8 +130,10 @@ def test_custom_components():
     print("-" * 40)
     
     try:
+        if COMPONENTS_IMPORT_ERROR:
+            raise COMPONENTS_IMPORT_ERROR
+        
         # Test broker
-        from dhan_broker import DhanBroker
         print("✅ DhanBroker can be imported")
         
         broker = DhanBroker()
@@ -107,7 +141,6 @@ def test_custom_components():
         print(f"   Initial Cash: ₹{broker.getcash():,.2f}")
         
         # Test data feed
-        from dhan_data_feed import DhanData
         print("✅ DhanData can be imported")
         
         # Don't actually create data feed here to avoid long wait
@@ -137,16 +170,19 @@ def test_backtrader_integration():
         dates = pd.date_range(start=datetime.now() - timedelta(days=5), 
                              periods=100, freq='5min')
         
-        np.random.seed(42)
-        prices = 2450 + np.cumsum(np.random.normal(0, 1, 100))
+        # Fill all OHLCV columns into one preallocated block
+        rng = np.random.default_rng(42)
+        prices = 2450 + np.cumsum(rng.standard_normal(100))
+        
+        ohlcv = np.empty((100, 5))
+        np.multiply(prices, 0.999, out=ohlcv[:, 0])
+        np.multiply(prices, 1.002, out=ohlcv[:, 1])
+        np.multiply(prices, 0.998, out=ohlcv[:, 2])
+        ohlcv[:, 3] = prices
+        ohlcv[:, 4] = rng.integers(1000, 10000, 100)
         
-        data = pd.DataFrame({
-            'open': prices * 0.999,
-            'high': prices * 1.002,
-            'low': prices * 0.998,
-            'close': prices,
-            'volume': np.random.randint(1000, 10000, 100)
-        }, index=dates)
+        data = pd.DataFrame(ohlcv, index=dates,
+                            columns=['open', 'high', 'low', 'close', 'volume'])
         
         # Add to cerebro
         data_feed = bt.feeds.PandasData(dataname=data)
@@ -181,12 +217,24 @@ def run_all_tests():
     print("🧪 Dhan + Backtrader Integration Test Suite")
     print("=" * 60)
     
+    # Start the Dhan API round-trip in the background so the network wait
+    # overlaps the local tests; the API test runs last and collects it.
+    # The shared client is built here, before DhanBroker() can race to it
+    executor = ThreadPoolExecutor(max_workers=1)
+    fund_limits = None
+    if not (CONFIG_IMPORT_ERROR or DHANHQ_IMPORT_ERROR):
+        try:
+            client = get_dhan_client()
+            fund_limits = executor.submit(client.get_fund_limits)
+        except Exception:
+            pass  # test_dhan_api retries and reports the error
+    
     tests = [
         ("Package Imports", test_imports),
         ("Configuration", test_config),
-        ("Dhan API", test_dhan_api),
         ("Custom Components", test_custom_components),
-        ("Backtrader Integration", test_backtrader_integration)
+        ("Backtrader Integration", test_backtrader_integration),
+        ("Dhan API", lambda: test_dhan_api(fund_limits))
     ]
     
     results = []
@@ -197,6 +245,7 @@ def run_all_tests():
         except Exception as e:
             print(f"\n❌ {test_name} crashed: {e}")
             results.append((test_name, False))
+    executor.shutdown(wait=False)
     
     # Summary
     print("\n" + "=" * 60)
@@ -206,14 +255,15 @@ def run_all_tests():
     passed = 0
     critical_failed = 0
     
+    lines = []
     for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status:8} | {test_name}")
+        lines.append(f"{'✅ PASS' if result else '❌ FAIL':8} | {test_name}")
         
         if result:
             passed += 1
         elif test_name in ["Package Imports", "Configuration", "Custom Components"]:
             critical_failed += 1
+    sys.stdout.write("\n".join(lines) + "\n")
     
     print(f"\nOverall: {passed}/{len(results)} tests passed")
     
@@ -235,11 +285,12 @@ def run_all_tests():
         print("❌ CRITICAL ISSUES FOUND")
         print("🔧 Fix these issues before proceeding:")
         
-        if not results[0][1]:  # Package imports failed
+        passed_tests = dict(results)
+        if not passed_tests["Package Imports"]:
             print("   - Install missing packages: pip install dhanhq backtrader pandas")
-        if not results[1][1]:  # Config failed
+        if not passed_tests["Configuration"]:
             print("   - Check dhan_config.py file")
-        if not results[3][1]:  # Custom components failed
+        if not passed_tests["Custom Components"]:
             print("   - Check dhan_broker.py and dhan_data_feed.py files")
 
 def print_next_steps():
@@ -271,4 +322,4 @@ if __name__ == '__main__':
         print("\n⚠️ Tests interrupted by user")
     except Exception as e:
         print(f"\n❌ Test suite crashed: {e}")
-        print(f"Traceback: {traceback.format_exc()}")
\ No newline at end of file
+        traceback.print_exc()
\ No newline at end of file
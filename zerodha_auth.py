@@ -4,9 +4,41 @@ Zerodha Authentication Handler
 Handles the OAuth flow to get access tokens
 """
 
-import hashlib
-from kiteconnect import KiteConnect
-from zerodha_config import ZERODHA_CONFIG, set_access_token
+import os
+import time
+from zerodha_config import (
+    ZERODHA_CONFIG, HTTP_POOL_CONFIG, TOKEN_FILE,
+    invalidate_token_cache, load_access_token, set_access_token,
+)
+
+# Shared client so every call reuses one HTTP session (and its connections)
+_kite = None
+
+# Last profile() response, reused for a short while per access token
+PROFILE_CACHE_SECONDS = 60
+_profile_cache = {'token': None, 'time': 0.0, 'profile': None}
+
+def get_kite():
+    """Return the shared KiteConnect client with the current access token"""
+    global _kite
+    if _kite is None:
+        # Imported here so modules that only need config or sample data load fast
+        from kiteconnect import KiteConnect
+        _kite = KiteConnect(api_key=ZERODHA_CONFIG['api_key'], pool=HTTP_POOL_CONFIG)
+    if ZERODHA_CONFIG['access_token']:
+        _kite.set_access_token(ZERODHA_CONFIG['access_token'])
+    return _kite
+
+def get_profile():
+    """Return the user profile, cached for PROFILE_CACHE_SECONDS"""
+    token = ZERODHA_CONFIG['access_token']
+    now = time.time()
+    if _profile_cache['token'] == token and now - _profile_cache['time'] < PROFILE_CACHE_SECONDS:
+        return _profile_cache['profile']
+    
+    profile = get_kite().profile()
+    _profile_cache.update(token=token, time=now, profile=profile)
+    return profile
 
 def authenticate_zerodha():
     """
@@ -16,7 +48,7 @@ def authenticate_zerodha():
     print("=" * 40)
     
     # Initialize KiteConnect
-    kite = KiteConnect(api_key=ZERODHA_CONFIG['api_key'])
+    kite = get_kite()
     
     # Step 1: Generate login URL
     login_url = kite.login_url()
@@ -59,18 +91,22 @@ def authenticate_zerodha():
         
         # Test the connection
         kite.set_access_token(access_token)
-        profile = kite.profile()
+        profile = get_profile()
         
         print(f"\n📊 Profile Information:")
         print(f"   Name: {profile.get('user_name', 'N/A')}")
         print(f"   Email: {profile.get('email', 'N/A')}")
         print(f"   Broker: {profile.get('broker', 'N/A')}")
         
-        # Save token to file for reuse
-        with open('zerodha_token.txt', 'w') as f:
+        # Save token to file for reuse - write then rename so readers
+        # never see a partially written token
+        tmp_file = f"{TOKEN_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
             f.write(access_token)
+        os.replace(tmp_file, TOKEN_FILE)
+        invalidate_token_cache()
         
-        print(f"\n💾 Access token saved to zerodha_token.txt")
+        print(f"\n💾 Access token saved to {TOKEN_FILE}")
         print(f"⚠️ Note: Zerodha tokens expire daily at 6 AM")
         
         return access_token
@@ -80,22 +116,8 @@ def authenticate_zerodha():
         return None
 
 def load_saved_token():
-    """Load previously saved access token"""
-    try:
-        with open('zerodha_token.txt', 'r') as f:
-            token = f.read().strip()
-        
-        if token:
-            set_access_token(token)
-            print(f"✅ Loaded saved access token")
-            return token
-        else:
-            print("⚠️ No saved token found")
-            return None
-            
-    except FileNotFoundError:
-        print("⚠️ No saved token file found")
-        return None
+    """Load previously saved access token - re-read only when the file changes"""
+    return load_access_token()
 
 def test_connection():
     """Test Zerodha API connection"""
@@ -104,20 +126,21 @@ def test_connection():
             print("❌ No access token available")
             return False
         
-        kite = KiteConnect(api_key=ZERODHA_CONFIG['api_key'])
-        kite.set_access_token(ZERODHA_CONFIG['access_token'])
+        kite = get_kite()
         
         # Test API call
-        profile = kite.profile()
+        profile = get_profile()
         print(f"✅ Connection test successful")
         print(f"   User: {profile.get('user_name', 'N/A')}")
         
         # Test historical data
         from datetime import datetime, timedelta
+        from zerodha_history_cache import cached_historical_data
         end_date = datetime.now()
         start_date = end_date - timedelta(days=2)
         
-        historical_data = kite.historical_data(
+        historical_data = cached_historical_data(
+            kite,
             instrument_token=738561,  # RELIANCE
             from_date=start_date,
             to_date=end_date,
@@ -5,15 +5,88 @@ Shows backtesting and paper trading capabilities
 """
 
 import backtrader as bt
+import numpy as np
+import pandas as pd
 import sys
 from datetime import datetime
+from numba_compat import njit
 from zerodha_config import ZERODHA_CONFIG, TRADING_CONFIG, STRATEGY_CONFIG, print_config
 from zerodha_broker import ZerodhaBroker
-from zerodha_data_feed import ZerodhaData
+from zerodha_data_feed import ZerodhaData, prefetch
+
+# Exit signal codes returned by generate_signals()
+EXIT_NONE = 0
+EXIT_MA_CROSS = 1
+EXIT_RSI_OVERBOUGHT = 2
+
+def wilder_average(values, period):
+    """Wilder's smoothed moving average, seeded with a simple average like Backtrader's"""
+    values = values.copy()
+    if len(values) <= period:
+        return values * np.nan
+    values.iloc[period] = values.iloc[1:period + 1].mean()
+    values.iloc[:period] = np.nan
+    return values.ewm(alpha=1.0 / period, adjust=False).mean()
+
+def compute_indicators(close, fast_period, slow_period, rsi_period):
+    """
+    Vectorized SMA, RSI and crossover over a full close price series
+    Returns (fast_ma, slow_ma, rsi, crossover) arrays aligned with close
+    """
+    close = pd.Series(close, dtype='float64')
+    fast_ma = close.rolling(fast_period).mean().values
+    slow_ma = close.rolling(slow_period).mean().values
+    
+    # Wilder's RSI - smoothed average gain / loss
+    delta = close.diff()
+    avg_gain = wilder_average(delta.clip(lower=0), rsi_period)
+    avg_loss = wilder_average(-delta.clip(upper=0), rsi_period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = (100.0 - 100.0 / (1.0 + avg_gain / avg_loss)).values
+    
+    # +1 when fast crosses above slow, -1 when it crosses below
+    crossover = np.zeros(len(close))
+    cross_up = (fast_ma[1:] > slow_ma[1:]) & (fast_ma[:-1] <= slow_ma[:-1])
+    cross_down = (fast_ma[1:] < slow_ma[1:]) & (fast_ma[:-1] >= slow_ma[:-1])
+    crossover[1:][cross_up] = 1.0
+    crossover[1:][cross_down] = -1.0
+    
+    return fast_ma, slow_ma, rsi, crossover
+
+@njit(cache=True)
+def bar_signal(crossover, rsi):
+    """Entry flag and exit code for one bar"""
+    # Buy: Fast MA crosses above Slow MA + RSI not overbought
+    entry = crossover > 0 and rsi < 70
+    
+    # Sell: MA cross down, else RSI overbought
+    if crossover < 0:
+        exit_code = EXIT_MA_CROSS
+    elif rsi > 80:
+        exit_code = EXIT_RSI_OVERBOUGHT
+    else:
+        exit_code = EXIT_NONE
+    return entry, exit_code
+
+@njit(cache=True)
+def generate_signals(crossover, rsi):
+    """
+    Entry flags and exit codes for every bar in one pass
+    Signals don't depend on position - next() still checks it, so a rejected
+    order can't put the precomputed signals out of step with the broker
+    """
+    n = len(crossover)
+    entries = np.zeros(n, np.bool_)
+    exits = np.zeros(n, np.int8)
+    for i in range(n):
+        entries[i], exits[i] = bar_signal(crossover[i], rsi[i])
+    return entries, exits
 
 class ZerodhaTradingStrategy(bt.Strategy):
     """
     Moving Average Crossover Strategy with RSI confirmation
+    Indicators are computed once over the preloaded data in start(), or bar
+    by bar with Backtrader indicators when the data isn't preloaded
     """
     
     params = (
@@ -25,24 +98,43 @@ class ZerodhaTradingStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        # Technical indicators
-        self.fast_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.fast_ma
-        )
-        self.slow_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.slow_ma
-        )
-        self.rsi = bt.indicators.RSI(
-            self.data.close, period=self.params.rsi_period
-        )
+        # Technical indicators - filled in by start() once the data is loaded
+        self.fast_ma = None
+        self.slow_ma = None
+        self.rsi = None
+        self.crossover = None
+        self.entries = None
+        self.exits = None
+        
+        # First bar with a valid crossover and RSI - next() waits for it
+        self._first_bar = max(self.params.slow_ma, self.params.rsi_period)
         
-        # Crossover signal
-        self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+        # Live feeds, preload=False and exactbars stop Cerebro preloading,
+        # so the close series isn't known up front - use Backtrader's
+        # indicators then (they also hold next() back until they're valid)
+        self._precomputed = self.env._dopreload
+        if not self._precomputed:
+            self._fast_line = bt.indicators.SimpleMovingAverage(
+                self.data.close, period=self.params.fast_ma
+            )
+            self._slow_line = bt.indicators.SimpleMovingAverage(
+                self.data.close, period=self.params.slow_ma
+            )
+            self._rsi_line = bt.indicators.RSI(
+                self.data.close, period=self.params.rsi_period
+            )
+            self._crossover_line = bt.indicators.CrossOver(self._fast_line, self._slow_line)
         
         # Order and trade tracking
         self.order = None
         self.trade_count = 0
-        self.bar_count = 0
+        
+        # Closed trade records - summarized after the run by print_trade_summary()
+        self._open_sizes = {}
+        self._trade_pnls = []
+        self._trade_commissions = []
+        self._trade_sizes = []
+        self._trade_prices = []
         
         if self.params.debug:
             print(f"Strategy initialized for {self.data._name}")
@@ -51,15 +143,41 @@ class ZerodhaTradingStrategy(bt.Strategy):
             print(f"   RSI: {self.params.rsi_period} periods")
             print(f"   Position Size: {self.params.position_size}")
     
+    def start(self):
+        """Precompute all indicator values over the preloaded close series"""
+        if not self._precomputed:
+            return
+        
+        self.fast_ma, self.slow_ma, self.rsi, self.crossover = compute_indicators(
+            np.asarray(self.data.close.array),
+            self.params.fast_ma,
+            self.params.slow_ma,
+            self.params.rsi_period
+        )
+        entries, exits = generate_signals(self.crossover, self.rsi)
+        
+        # next() reads one signal per bar - plain list indexing is much
+        # cheaper than producing a NumPy scalar from an array each time
+        self.entries = entries.tolist()
+        self.exits = exits.tolist()
+    
     def next(self):
-        self.bar_count += 1
+        if self._precomputed:
+            i = len(self.data) - 1  # Index of the current bar in the precomputed arrays
+            if i < self._first_bar:
+                return
+            fast_ma, slow_ma, rsi = self.fast_ma[i], self.slow_ma[i], self.rsi[i]
+            entry, exit_signal = self.entries[i], self.exits[i]
+        else:
+            fast_ma, slow_ma, rsi = self._fast_line[0], self._slow_line[0], self._rsi_line[0]
+            entry, exit_signal = bar_signal(self._crossover_line[0], rsi)
         
         # Skip if we have a pending order
         if self.order:
             return
         
         # Print status every 50 bars
-        if self.bar_count % 50 == 0 and self.params.debug:
+        if len(self) % 50 == 0:
             self.print_status()
         
         # Trading logic
@@ -68,30 +186,19 @@ class ZerodhaTradingStrategy(bt.Strategy):
         # Entry signals
         if not current_position:  # No position
             # Buy signal: Fast MA crosses above Slow MA + RSI not overbought
-            if (self.crossover[0] > 0 and 
-                self.rsi[0] < 70 and 
-                len(self.data) > self.params.slow_ma):
-                
-                self.log_signal("BUY", f"MA Cross + RSI={self.rsi[0]:.1f}")
+            if entry:
+                self.log_signal("BUY", f"MA Cross + RSI={rsi:.1f}", fast_ma, slow_ma, rsi)
                 self.order = self.buy(size=self.params.position_size)
         
         else:  # Have position
             # Exit signals
-            exit_condition = False
-            exit_reason = ""
-            
-            # Exit on MA cross down
-            if self.crossover[0] < 0:
-                exit_condition = True
-                exit_reason = "MA Cross Down"
-            
-            # Exit on RSI overbought
-            elif self.rsi[0] > 80:
-                exit_condition = True
-                exit_reason = f"RSI Overbought ({self.rsi[0]:.1f})"
-            
-            if exit_condition:
-                self.log_signal("SELL", exit_reason)
+            if exit_signal != EXIT_NONE:
+                if exit_signal == EXIT_MA_CROSS:
+                    exit_reason = "MA Cross Down"
+                else:
+                    exit_reason = f"RSI Overbought ({rsi:.1f})"
+                
+                self.log_signal("SELL", exit_reason, fast_ma, slow_ma, rsi)
                 self.order = self.sell(size=self.params.position_size)
     
     def notify_order(self, order):
@@ -99,60 +206,82 @@ class ZerodhaTradingStrategy(bt.Strategy):
         if order.status in [order.Submitted, order.Accepted]:
             return
         
-        if order.status in [order.Completed]:
-            if order.isbuy():
-                self.log(f"BUY EXECUTED")
-                self.log(f"   Price: Rs{order.executed.price:.2f}")
-                self.log(f"   Size: {order.executed.size}")
-                self.log(f"   Commission: Rs{order.executed.comm:.2f}")
-            else:
-                self.log(f"SELL EXECUTED")
-                self.log(f"   Price: Rs{order.executed.price:.2f}")
-                self.log(f"   Size: {order.executed.size}")
-                self.log(f"   Commission: Rs{order.executed.comm:.2f}")
+        if self.params.debug:
+            if order.status in [order.Completed]:
+                if order.isbuy():
+                    self.log(f"BUY EXECUTED")
+                    self.log(f"   Price: Rs{order.executed.price:.2f}")
+                    self.log(f"   Size: {order.executed.size}")
+                    self.log(f"   Commission: Rs{order.executed.comm:.2f}")
+                else:
+                    self.log(f"SELL EXECUTED")
+                    self.log(f"   Price: Rs{order.executed.price:.2f}")
+                    self.log(f"   Size: {order.executed.size}")
+                    self.log(f"   Commission: Rs{order.executed.comm:.2f}")
                 
-        elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-            self.log(f"ORDER {order.status}")
+            elif order.status in [order.Canceled, order.Margin, order.Rejected]:
+                self.log(f"ORDER {order.status}")
         
         self.order = None
     
     def notify_trade(self, trade):
-        """Handle trade notifications"""
+        """Record closed trades - reporting is deferred to print_trade_summary()"""
+        if trade.justopened:
+            # A closed trade reports size 0, so keep the opening size for ROI
+            self._open_sizes[trade.ref] = trade.size
+        
         if trade.isclosed:
             self.trade_count += 1
-            profit = trade.pnl - trade.commission
-            
-            self.log(f"TRADE #{self.trade_count} CLOSED")
-            self.log(f"   Gross P&L: Rs{trade.pnl:.2f}")
-            self.log(f"   Commission: Rs{trade.commission:.2f}")
-            self.log(f"   Net P&L: Rs{profit:.2f}")
-            
-            if trade.price > 0:
-                roi = (profit / (trade.size * trade.price)) * 100
-                self.log(f"   ROI: {roi:.2f}%")
+            self._trade_pnls.append(trade.pnl)
+            self._trade_commissions.append(trade.commission)
+            self._trade_sizes.append(self._open_sizes.pop(trade.ref, 0))
+            self._trade_prices.append(trade.price)
     
-    def log_signal(self, signal_type, reason):
+    def print_trade_summary(self):
+        """Print P&L and ROI for every closed trade"""
+        if not self._trade_pnls:
+            print("No closed trades")
+            return
+        
+        gross = np.array(self._trade_pnls)
+        commissions = np.array(self._trade_commissions)
+        net = gross - commissions
+        notional = np.abs(np.array(self._trade_sizes) * np.array(self._trade_prices))
+        rois = np.divide(net, notional, out=np.zeros_like(net), where=notional > 0) * 100
+        
+        print("CLOSED TRADES")
+        for n, (g, c, p, r) in enumerate(zip(gross, commissions, net, rois), 1):
+            print(f"   #{n}: Gross Rs{g:.2f} | Commission Rs{c:.2f} | Net Rs{p:.2f} | ROI {r:.2f}%")
+        print(f"   Total: {len(net)} trades | Net P&L Rs{net.sum():,.2f} | "
+              f"Win rate {(net > 0).mean() * 100:.1f}%")
+    
+    def log_signal(self, signal_type, reason, fast_ma, slow_ma, rsi):
         """Log trading signals"""
+        if not self.params.debug:
+            return
+        
         self.log(f"{signal_type} SIGNAL")
         self.log(f"   Reason: {reason}")
         self.log(f"   Price: Rs{self.data.close[0]:.2f}")
-        self.log(f"   Fast MA: Rs{self.fast_ma[0]:.2f}")
-        self.log(f"   Slow MA: Rs{self.slow_ma[0]:.2f}")
-        self.log(f"   RSI: {self.rsi[0]:.1f}")
+        self.log(f"   Fast MA: Rs{fast_ma:.2f}")
+        self.log(f"   Slow MA: Rs{slow_ma:.2f}")
+        self.log(f"   RSI: {rsi:.1f}")
     
     def print_status(self):
         """Print current status"""
-        self.log(f"Status Update (Bar {self.bar_count})")
+        if not self.params.debug:
+            return
+        
+        self.log(f"Status Update (Bar {len(self)})")
         self.log(f"   Date: {self.data.datetime.datetime(0)}")
         self.log(f"   Price: Rs{self.data.close[0]:.2f}")
         self.log(f"   Position: {self.position.size}")
         self.log(f"   Cash: Rs{self.broker.getcash():.2f}")
     
     def log(self, txt):
-        """Logging function"""
-        if self.params.debug:
-            dt = self.data.datetime.datetime(0)
-            print(f"[{dt.strftime('%Y-%m-%d %H:%M')}] {txt}")
+        """Logging function - callers check params.debug before formatting"""
+        dt = self.data.datetime.datetime(0)
+        print(f"[{dt.strftime('%Y-%m-%d %H:%M')}] {txt}")
 
 def check_authentication():
     """Check if we have valid Zerodha authentication"""
@@ -162,10 +291,8 @@ def check_authentication():
         return False
     
     try:
-        from kiteconnect import KiteConnect
-        kite = KiteConnect(api_key=ZERODHA_CONFIG['api_key'])
-        kite.set_access_token(ZERODHA_CONFIG['access_token'])
-        profile = kite.profile()
+        from zerodha_auth import get_profile
+        profile = get_profile()
         print(f"Authenticated as: {profile.get('user_name', 'Unknown')}")
         return True
     except Exception as e:
@@ -197,6 +324,9 @@ def run_zerodha_demo():
     # Add data feeds
     symbols_to_trade = ['RELIANCE', 'TCS']  # Start with two symbols
     
+    # Fetch every symbol's history concurrently, then build the feeds from it
+    prefetch(symbols_to_trade, timeframe='5minute', historical_days=10)
+    
     for symbol in symbols_to_trade:
         print(f"Adding data feed for {symbol}...")
         
@@ -244,6 +374,8 @@ def run_zerodha_demo():
         print(f"Total Return: Rs{total_return:,.2f}")
         print(f"Return Percentage: {return_pct:.2f}%")
         
+        strategy.print_trade_summary()
+        
         print("Demo completed successfully!")
         print("What this demonstrates:")
         print("   - Zerodha API integration with Backtrader")
@@ -262,7 +394,7 @@ def run_zerodha_demo():
     except Exception as e:
         print(f"Demo failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
 if __name__ == '__main__':
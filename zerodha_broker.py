@@ -6,15 +6,15 @@ Fixed Zerodha Demo - Addresses token loading and broker implementation issues
 import backtrader as bt
 import pandas as pd
 import numpy as np
+import logging
+import multiprocessing
+import os
+import sys
+from multiprocessing import shared_memory
 from datetime import datetime, timedelta
-
-# Load saved access token
-def load_access_token():
-    try:
-        with open('zerodha_token.txt', 'r') as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None
+import indicators_aot
+from numba_compat import njit
+from zerodha_config import load_access_token
 
 # Configuration
 ZERODHA_CONFIG = {
@@ -27,6 +27,29 @@ TRADING_CONFIG = {
     'commission': 20.0
 }
 
+# Indicator kernel - the ahead-of-time build from indicators_aot.py when it
+# has been compiled from the current source, otherwise JIT-compiled (and
+# cached) on first use
+try:
+    import zerodha_indicators
+except ImportError:
+    zerodha_indicators = None
+
+_aot_version = getattr(zerodha_indicators, 'kernel_version', lambda: None)()
+if _aot_version == indicators_aot.KERNEL_VERSION:
+    sma_crossover = zerodha_indicators.sma_crossover
+else:
+    if zerodha_indicators is not None:
+        print("⚠️ zerodha_indicators build is out of date - run: python indicators_aot.py")
+    sma_crossover = njit(cache=True)(indicators_aot.sma_crossover)
+
+# Strategy chatter goes through logging - run_fixed_demo() sends it to the console
+logger = logging.getLogger('SimpleStrategy')
+logger.addHandler(logging.NullHandler())
+
+def _no_log(*args, **kwargs):
+    """Stand-in for logger.info when debug output is off"""
+
 class SimpleStrategy(bt.Strategy):
     """Simple strategy for testing"""
     
@@ -34,47 +57,65 @@ class SimpleStrategy(bt.Strategy):
         ('fast_ma', 10),
         ('slow_ma', 30),
         ('position_size', 1),
+        ('debug', True),
     )
     
     def __init__(self):
-        self.fast_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.fast_ma
-        )
-        self.slow_ma = bt.indicators.SimpleMovingAverage(
-            self.data.close, period=self.params.slow_ma
-        )
-        self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+        # Signals are computed once in start(), after the data is preloaded
+        self.crossover = None
         self.order = None
         self.trade_count = 0
+        self._log = logger.info if self.params.debug else _no_log
+        
+        # Without preloading (live feeds, preload=False, exactbars) the close
+        # series isn't there in start() - use Backtrader's CrossOver instead
+        self._precomputed = self.env._dopreload
+        if not self._precomputed:
+            self._crossover_line = bt.indicators.CrossOver(
+                bt.indicators.SMA(self.data.close, period=self.params.fast_ma),
+                bt.indicators.SMA(self.data.close, period=self.params.slow_ma),
+            )
+        
+        self._log(f"Strategy initialized for {self.data._name}")
+    
+    def start(self):
+        if not self._precomputed:
+            return
         
-        print(f"Strategy initialized for {self.data._name}")
+        close = np.asarray(self.data.close.array, dtype=np.float64)
+        _, _, crossover = sma_crossover(close, self.params.fast_ma, self.params.slow_ma)
+        self.crossover = crossover.tolist()
     
     def next(self):
         if self.order:
             return
         
+        if self._precomputed:
+            crossover = self.crossover[len(self.data) - 1]
+        else:
+            crossover = self._crossover_line[0]
         if not self.position:
-            if self.crossover[0] > 0:  # Fast MA crosses above slow MA
-                print(f"BUY SIGNAL at Rs{self.data.close[0]:.2f}")
+            if crossover > 0:  # Fast MA crosses above slow MA
+                self._log(f"BUY SIGNAL at Rs{self.data.close[0]:.2f}")
                 self.order = self.buy(size=self.params.position_size)
         else:
-            if self.crossover[0] < 0:  # Fast MA crosses below slow MA
-                print(f"SELL SIGNAL at Rs{self.data.close[0]:.2f}")
+            if crossover < 0:  # Fast MA crosses below slow MA
+                self._log(f"SELL SIGNAL at Rs{self.data.close[0]:.2f}")
                 self.order = self.sell(size=self.params.position_size)
     
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
-                print(f"BUY EXECUTED: {order.executed.size} @ Rs{order.executed.price:.2f}")
+                self._log(f"BUY EXECUTED: {order.executed.size} @ Rs{order.executed.price:.2f}")
             else:
-                print(f"SELL EXECUTED: {order.executed.size} @ Rs{order.executed.price:.2f}")
+                self._log(f"SELL EXECUTED: {order.executed.size} @ Rs{order.executed.price:.2f}")
         self.order = None
     
     def notify_trade(self, trade):
         if trade.isclosed:
             self.trade_count += 1
             profit = trade.pnl - trade.commission
-            print(f"TRADE #{self.trade_count}: P&L = Rs{profit:.2f}")
+            self._log(f"TRADE #{self.trade_count}: P&L = Rs{profit:.2f}")
 
 def create_sample_data(symbol="RELIANCE", days=10):
     """Create sample data for testing"""
@@ -82,38 +123,44 @@ def create_sample_data(symbol="RELIANCE", days=10):
     
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
-    dates = pd.date_range(start=start_date, end=end_date, freq='5min')
     
-    # Filter to trading hours
-    dates = dates[(dates.hour >= 9) & (dates.hour < 16)]
+    # Trading hours (9:00 AM to 4:00 PM) on weekdays only
+    sessions = pd.bdate_range(start_date.date(), end_date.date())
+    offsets = pd.timedelta_range('9h', '15h55min', freq='5min')
+    dates = pd.DatetimeIndex((sessions.values[:, None] + offsets.values).ravel())
+    dates = dates[:dates.searchsorted(end_date, side='right')]
     dates = dates[:200]  # Limit to 200 bars
     
-    # Generate realistic price data
-    np.random.seed(42)
+    # Generate realistic price data - draw all the noise up front from a
+    # local generator, so results don't depend on global random state
+    rng = np.random.default_rng(42)
+    n = len(dates)
     base_price = 2450 if symbol == "RELIANCE" else 3200
-    returns = np.random.normal(0, 0.001, len(dates))
+    returns = rng.normal(0, 0.001, n)
+    open_noise = rng.normal(0, 0.002, n)
+    high_noise = np.abs(rng.normal(0, 0.005, n))
+    low_noise = np.abs(rng.normal(0, 0.005, n))
+    volumes = rng.lognormal(11, 0.8, n).astype(np.int32)
+    
     log_returns = np.cumsum(returns)
-    prices = base_price * np.exp(log_returns)
-    
-    # Create OHLCV data
-    data = []
-    for i, (date, close) in enumerate(zip(dates, prices)):
-        open_price = close * (1 + np.random.normal(0, 0.002))
-        high = max(open_price, close) * (1 + abs(np.random.normal(0, 0.005)))
-        low = min(open_price, close) * (1 - abs(np.random.normal(0, 0.005)))
-        volume = int(np.random.lognormal(11, 0.8))
-        
-        data.append({
-            'datetime': date,
-            'open': round(open_price, 2),
-            'high': round(high, 2),
-            'low': round(low, 2),
-            'close': round(close, 2),
-            'volume': volume
-        })
-    
-    df = pd.DataFrame(data)
-    df.set_index('datetime', inplace=True)
+    closes = base_price * np.exp(log_returns)
+    
+    # Create OHLCV data - whole columns at once
+    opens = closes * (1 + open_noise)
+    highs = np.maximum(opens, closes) * (1 + high_noise)
+    lows = np.minimum(opens, closes) * (1 - low_noise)
+    
+    # Round to paise in place - no extra arrays
+    for prices in (opens, highs, lows, closes):
+        np.round(prices, 2, out=prices)
+    
+    df = pd.DataFrame({
+        'open': opens,
+        'high': highs,
+        'low': lows,
+        'close': closes,
+        'volume': volumes
+    }, index=pd.DatetimeIndex(dates, name='datetime'), copy=False)
     
     print(f"Created {len(df)} bars")
     print(f"   Price range: Rs{df['close'].min():.2f} - Rs{df['close'].max():.2f}")
@@ -167,6 +214,9 @@ def run_fixed_demo():
     
     print()
     
+    # Show the strategy's signal and trade messages
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    
     # Create cerebro
     cerebro = bt.Cerebro()
     
@@ -226,8 +276,126 @@ def run_fixed_demo():
     except Exception as e:
         print(f"Demo failed: {e}")
         import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        traceback.print_exc()
         return False
 
+# Sample data for sweep workers, rebuilt by _init_sweep_worker() on top of
+# shared memory blocks published once by the parent process
+_sweep_data = None
+_sweep_blocks = []
+
+def _share_frame(df):
+    """Copy the index and columns of df into shared memory blocks"""
+    columns = {'datetime': df.index.to_numpy()}
+    columns.update((name, df[name].to_numpy()) for name in df.columns)
+    
+    blocks, specs = [], {}
+    for name, values in columns.items():
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+        blocks.append(block)
+        specs[name] = (block.name, values.shape, values.dtype.str)
+    return blocks, specs
+
+def _init_sweep_worker(specs):
+    """Pool initializer - attach the shared sample data"""
+    global _sweep_data
+    
+    columns = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _sweep_blocks.append(block)  # the arrays are only valid while attached
+        columns[name] = np.ndarray(shape, dtype, buffer=block.buf)
+    
+    index = pd.DatetimeIndex(columns.pop('datetime'), name='datetime')
+    _sweep_data = pd.DataFrame(columns, index=index, copy=False)
+
+def _run_one(params):
+    """Backtest SimpleStrategy with one (fast_ma, slow_ma) pair"""
+    fast, slow = params
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(TRADING_CONFIG['initial_cash'])
+    cerebro.broker.setcommission(commission=TRADING_CONFIG['commission'])
+    cerebro.adddata(bt.feeds.PandasData(dataname=_sweep_data), name="RELIANCE")
+    cerebro.addstrategy(SimpleStrategy, fast_ma=fast, slow_ma=slow, debug=False)
+    strategy = cerebro.run()[0]
+    return params, cerebro.broker.getvalue(), strategy.trade_count
+
+def run_parameter_sweep(grid=None, symbol="RELIANCE", days=5):
+    """Backtest a grid of (fast_ma, slow_ma) pairs in parallel, one process per core"""
+    if grid is None:
+        grid = [(fast, slow) for fast in (5, 10, 15, 20) for slow in (30, 40, 50)]
+    
+    processes = min(os.cpu_count() or 1, len(grid))
+    print(f"Parameter sweep: {len(grid)} combinations on {processes} processes")
+    print("=" * 50)
+    
+    # Build the data once and let every worker map the same memory
+    blocks, specs = _share_frame(create_sample_data(symbol, days))
+    try:
+        with multiprocessing.Pool(processes, initializer=_init_sweep_worker,
+                                  initargs=(specs,)) as pool:
+            results = pool.map(_run_one, grid)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    
+    for (fast, slow), final_value, trade_count in sorted(results, key=lambda r: r[1], reverse=True):
+        print(f"fast={fast:>3} slow={slow:>3}  Final: Rs{final_value:,.2f}  Trades: {trade_count}")
+    
+    return results
+
+def verify_sma_crossover(close, fast_ma=10, slow_ma=30):
+    """Check sma_crossover() against Backtrader's own SMA and CrossOver indicators"""
+    close = np.asarray(close, dtype=np.float64)
+    
+    class ReferenceStrategy(bt.Strategy):
+        def __init__(self):
+            self.fast_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=fast_ma)
+            self.slow_ma = bt.indicators.SimpleMovingAverage(self.data.close, period=slow_ma)
+            self.crossover = bt.indicators.CrossOver(self.fast_ma, self.slow_ma)
+    
+    dates = pd.date_range('2024-01-01 09:15', periods=len(close), freq='5min')
+    df = pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                       'volume': 0}, index=pd.DatetimeIndex(dates, name='datetime'))
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(ReferenceStrategy)
+    reference = cerebro.run()[0]
+    
+    fast, slow, crossover = sma_crossover(close, fast_ma, slow_ma)
+    averages_match = (
+        np.allclose(fast, reference.fast_ma.array, rtol=1e-12, equal_nan=True) and
+        np.allclose(slow, reference.slow_ma.array, rtol=1e-12, equal_nan=True)
+    )
+    signals_match = np.array_equal(crossover, np.nan_to_num(reference.crossover.array))
+    
+    status = "✅" if averages_match and signals_match else "❌"
+    print(f"{status} fast={fast_ma} slow={slow_ma} on {len(close)} bars: "
+          f"averages {'match' if averages_match else 'differ'}, "
+          f"crossovers {'match' if signals_match else 'differ'}")
+    return averages_match and signals_match
+
+def run_kernel_check():
+    """Verify the indicator kernel on sample data and on a tie-heavy 0.1-tick walk"""
+    print("Indicator kernel check")
+    print("=" * 50)
+    
+    sample_close = create_sample_data("RELIANCE", 10)['close']
+    # Coarse ticks make the fast and slow averages tie exactly now and then
+    rng = np.random.default_rng(0)
+    tick_close = np.round(2450 + np.cumsum(rng.normal(0, 0.1, 2000)), 1)
+    
+    results = [verify_sma_crossover(close, fast, slow)
+               for close in (sample_close, tick_close)
+               for fast, slow in ((5, 20), (10, 30), (20, 50))]
+    return all(results)
+
 if __name__ == '__main__':
-    run_fixed_demo()
\ No newline at end of file
+    if '--sweep' in sys.argv:
+        run_parameter_sweep()
+    elif '--verify' in sys.argv:
+        sys.exit(0 if run_kernel_check() else 1)
+    else:
+        run_fixed_demo()
\ No newline at end of file
@@ -1,6 +1,8 @@
 # fixed_zerodha_config.py
 # Fixed configuration that properly loads saved tokens
 
+import os
+
 # Zerodha API Configuration
 ZERODHA_CONFIG = {
     'api_key': 'gs9ulgi4ipyq5tkf',
@@ -50,6 +52,13 @@ ZERODHA_INSTRUMENTS = {
     }
 }
 
+# Connection pool for KiteConnect's requests session (HTTPAdapter arguments)
+HTTP_POOL_CONFIG = {
+    'pool_connections': 20,
+    'pool_maxsize': 20,
+    'max_retries': 1
+}
+
 # Strategy Parameters
 STRATEGY_CONFIG = {
     'fast_ma_period': 10,
@@ -60,27 +69,43 @@ STRATEGY_CONFIG = {
     'debug': True
 }
 
+TOKEN_FILE = 'zerodha_token.txt'
+
+# Last token read from TOKEN_FILE, keyed by the file's mtime
+_token_cache = {'mtime': None, 'token': None}
+
 def load_access_token():
-    """Load access token from saved file"""
+    """Load access token from saved file - re-read only when the file changes"""
     try:
-        with open('zerodha_token.txt', 'r') as f:
-            token = f.read().strip()
+        mtime = os.stat(TOKEN_FILE).st_mtime_ns
+        if mtime == _token_cache['mtime']:
+            token = _token_cache['token']
+        else:
+            with open(TOKEN_FILE, 'r') as f:
+                token = f.read().strip() or None
+            _token_cache.update(mtime=mtime, token=token)
+            
+            if token:
+                print(f"✅ Access token loaded from file")
+            else:
+                print("⚠️ Empty token file")
         
         if token:
             ZERODHA_CONFIG['access_token'] = token
-            print(f"✅ Access token loaded from file")
-            return token
-        else:
-            print("⚠️ Empty token file")
-            return None
+        return token
             
     except FileNotFoundError:
+        invalidate_token_cache()
         print("⚠️ No saved token file found")
         return None
     except Exception as e:
         print(f"❌ Error loading token: {e}")
         return None
 
+def invalidate_token_cache():
+    """Forget the cached token so the next load_access_token() re-reads the file"""
+    _token_cache.update(mtime=None, token=None)
+
 def set_access_token(token):
     """Set access token"""
     ZERODHA_CONFIG['access_token'] = token
@@ -1,8 +1,75 @@
 import backtrader as bt
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from kiteconnect import KiteConnect
 from zerodha_config import ZERODHA_CONFIG, DATA_CONFIG, ZERODHA_INSTRUMENTS, TIMEFRAME_MAP
+from zerodha_auth import get_kite
+from zerodha_history_cache import cached_historical_data
+
+# Candle length per Kite interval - a cached fetch is reused until a new candle is due
+CANDLE_SECONDS = {
+    'minute': 60,
+    '3minute': 3 * 60,
+    '5minute': 5 * 60,
+    '10minute': 10 * 60,
+    '15minute': 15 * 60,
+    '30minute': 30 * 60,
+    '60minute': 60 * 60,
+    'day': 24 * 60 * 60,
+}
+
+# Market hours (9:15 AM to 3:30 PM IST) as minutes since midnight
+MARKET_OPEN_MINUTES = 9 * 60 + 15
+MARKET_CLOSE_MINUTES = 15 * 60 + 30
+
+# Fields kept from historical_data - Backtrader needs nothing else
+HISTORICAL_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+# Raw history from prefetch(), keyed by (symbol, timeframe, historical_days) -
+# each frame is handed to the first ZerodhaData built with those params
+_prefetched_history = {}
+
+def _fetch_history(kite, instrument_token, timeframe, historical_days):
+    """Raw historical_data frame for one instrument, through the Parquet cache"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=historical_days)
+    kite_timeframe = TIMEFRAME_MAP.get(timeframe, '5minute')
+    
+    return cached_historical_data(
+        kite,
+        instrument_token=instrument_token,
+        from_date=start_date,
+        to_date=end_date,
+        interval=kite_timeframe,
+        max_age=CANDLE_SECONDS.get(kite_timeframe, CANDLE_SECONDS['5minute']),
+        columns=HISTORICAL_COLUMNS
+    )
+
+def prefetch(symbols, timeframe=DATA_CONFIG['timeframe'], historical_days=DATA_CONFIG['historical_days']):
+    """Fetch history for several symbols concurrently, ahead of building their feeds"""
+    if not ZERODHA_CONFIG['access_token']:
+        return
+    
+    symbols = [s for s in symbols if s in ZERODHA_INSTRUMENTS]
+    if not symbols:
+        return
+    
+    kite = get_kite()
+    
+    def fetch(symbol):
+        token = ZERODHA_INSTRUMENTS[symbol]['instrument_token']
+        return _fetch_history(kite, token, timeframe, historical_days)
+    
+    print(f"Prefetching history for {', '.join(symbols)}...")
+    with ThreadPoolExecutor(max_workers=min(len(symbols), 8)) as executor:
+        futures = {symbol: executor.submit(fetch, symbol) for symbol in symbols}
+    
+    for symbol, future in futures.items():
+        try:
+            _prefetched_history[(symbol, timeframe, historical_days)] = future.result()
+        except Exception as e:
+            print(f"Prefetch failed for {symbol}: {e}")
 
 class ZerodhaData(bt.feeds.PandasData):
     """
@@ -20,12 +87,16 @@ class ZerodhaData(bt.feeds.PandasData):
     def __init__(self):
         self.kite = None
         self.instrument_info = None
+        self._token = None  # instrument token, and its str() for quote lookups
+        self._token_str = None
+        
+        # A DataFrame passed in as dataname is used as is - no history fetch
+        supplied_data = isinstance(self.p.dataname, pd.DataFrame)
         
-        # Initialize KiteConnect if we have access token
-        if ZERODHA_CONFIG['access_token']:
+        # Initialize KiteConnect if we have access token and something to fetch
+        if ZERODHA_CONFIG['access_token'] and (self.p.live or not supplied_data):
             try:
-                self.kite = KiteConnect(api_key=ZERODHA_CONFIG['api_key'])
-                self.kite.set_access_token(ZERODHA_CONFIG['access_token'])
+                self.kite = get_kite()
                 print(f"Data feed connected to Zerodha API")
             except Exception as e:
                 print(f"Data feed API connection failed: {e}")
@@ -38,14 +109,17 @@ class ZerodhaData(bt.feeds.PandasData):
         # Get instrument information
         self._get_instrument_info()
         
-        # Fetch historical data
-        historical_data = self._fetch_historical_data()
-        if historical_data is not None and not historical_data.empty:
-            self.p.dataname = historical_data
-            print(f"Loaded {len(historical_data)} bars of historical data")
+        # Fetch historical data, unless a DataFrame was passed in as dataname
+        if supplied_data:
+            print(f"Using {len(self.p.dataname)} bars of supplied data")
         else:
-            print("No historical data loaded - creating sample data")
-            self.p.dataname = self._create_sample_data()
+            historical_data = self._fetch_historical_data()
+            if historical_data is not None and not historical_data.empty:
+                self.p.dataname = historical_data
+                print(f"Loaded {len(historical_data)} bars of historical data")
+            else:
+                print("No historical data loaded - creating sample data")
+                self.p.dataname = self._create_sample_data()
         
         super(ZerodhaData, self).__init__()
     
@@ -53,6 +127,8 @@ class ZerodhaData(bt.feeds.PandasData):
         """Get instrument information from config"""
         if self.p.symbol in ZERODHA_INSTRUMENTS:
             self.instrument_info = ZERODHA_INSTRUMENTS[self.p.symbol]
+            self._token = self.instrument_info['instrument_token']
+            self._token_str = str(self._token)
             print(f"Instrument info found: {self.instrument_info}")
         else:
             print(f"Warning: Symbol {self.p.symbol} not in config")
@@ -74,24 +150,21 @@ class ZerodhaData(bt.feeds.PandasData):
             print(f"   Date range: {start_date.date()} to {end_date.date()}")
             print(f"   Timeframe: {self.p.timeframe}")
             
-            # Get Zerodha timeframe
-            kite_timeframe = TIMEFRAME_MAP.get(self.p.timeframe, '5minute')
-            
-            # Fetch data
-            historical_data = self.kite.historical_data(
-                instrument_token=self.instrument_info['instrument_token'],
-                from_date=start_date,
-                to_date=end_date,
-                interval=kite_timeframe
-            )
+            # Use a prefetched frame if there is one, otherwise fetch now
+            # (served from the local Parquet cache on repeat runs)
+            df = _prefetched_history.pop((self.p.symbol, self.p.timeframe, self.p.historical_days), None)
+            if df is None:
+                df = _fetch_history(
+                    self.kite,
+                    self._token,
+                    self.p.timeframe,
+                    self.p.historical_days
+                )
             
-            if not historical_data:
+            if df.empty:
                 print("No historical data returned from API")
                 return None
             
-            # Convert to pandas DataFrame
-            df = pd.DataFrame(historical_data)
-            
             # Rename columns to match Backtrader format
             column_mapping = {
                 'date': 'datetime',
@@ -104,15 +177,27 @@ class ZerodhaData(bt.feeds.PandasData):
             
             df = df.rename(columns=column_mapping)
             
-            # Ensure datetime column is datetime type
-            df['datetime'] = pd.to_datetime(df['datetime'])
+            # Ensure datetime column is datetime type - Kite already returns
+            # datetimes (and the Parquet cache keeps them), so only strings
+            # need parsing, with the format given to skip inference
+            if not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+                df['datetime'] = pd.to_datetime(df['datetime'], format='ISO8601')
             df.set_index('datetime', inplace=True)
             
             # Sort by datetime
             df.sort_index(inplace=True)
             
-            # Remove any duplicate timestamps
-            df = df[~df.index.duplicated(keep='first')]
+            # Remove any duplicate timestamps - once sorted, a repeat is
+            # always next to the bar it duplicates
+            ix = df.index.asi8
+            if len(ix) > 1:
+                df = df.iloc[np.concatenate(([True], ix[1:] != ix[:-1]))]
+            
+            # Store volume as int32 when it fits (a cast would wrap silently,
+            # and daily volumes can exceed it). Prices stay float64: Backtrader
+            # lines are doubles anyway, and float32 can't hold paise exactly
+            if df['volume'].max() <= np.iinfo(np.int32).max:
+                df = df.astype({'volume': np.int32})
             
             print(f"Successfully fetched {len(df)} bars from Zerodha API")
             print(f"   Price range: ₹{df['close'].min():.2f} - ₹{df['close'].max():.2f}")
@@ -128,8 +213,6 @@ class ZerodhaData(bt.feeds.PandasData):
         """Create sample data when API data is not available"""
         print(f"Creating sample data for {self.p.symbol}...")
         
-        import numpy as np
-        
         # Generate date range based on timeframe
         end_date = datetime.now()
         start_date = end_date - timedelta(days=self.p.historical_days)
@@ -139,30 +222,28 @@ class ZerodhaData(bt.feeds.PandasData):
             'minute': '1min',
             '5minute': '5min',
             '15minute': '15min',
-            'hour': '1H',
+            'hour': '1h',
             'day': 'D'
         }
         
         freq = freq_map.get(self.p.timeframe, '5min')
         
-        # Generate date range
-        dates = pd.date_range(start=start_date, end=end_date, freq=freq)
-        
-        # Filter to trading hours for intraday data
-        if freq != 'D':
-            dates = dates[(dates.hour >= 9) & (dates.hour < 16)]
-            # Further filter to market hours (9:15 AM to 3:30 PM)
-            dates = dates[
-                ((dates.hour == 9) & (dates.minute >= 15)) |
-                ((dates.hour > 9) & (dates.hour < 15)) |
-                ((dates.hour == 15) & (dates.minute <= 30))
-            ]
+        # Generate date range - intraday bars only inside market hours
+        # (9:15 AM to 3:30 PM) on weekdays, so nothing needs filtering out
+        if freq == 'D':
+            dates = pd.date_range(start=start_date, end=end_date, freq=freq)
+        else:
+            sessions = pd.bdate_range(start_date.date(), end_date.date())
+            offsets = pd.timedelta_range('9h15min', '15h30min', freq=freq)
+            dates = pd.DatetimeIndex((sessions.values[:, None] + offsets.values).ravel())
+            dates = dates[:dates.searchsorted(end_date, side='right')]
         
         # Limit number of bars
         dates = dates[-500:] if len(dates) > 500 else dates
         
-        # Generate realistic price data based on symbol
-        np.random.seed(42)
+        # Generate realistic price data based on symbol - a local generator
+        # keeps this reproducible when feeds are built on parallel threads
+        rng = np.random.default_rng(42)
         
         base_prices = {
             'RELIANCE': 2450,
@@ -176,42 +257,33 @@ class ZerodhaData(bt.feeds.PandasData):
         volatility = 0.02 if freq == 'D' else 0.005  # Lower volatility for intraday
         
         # Generate price series with random walk
-        returns = np.random.normal(0, volatility/np.sqrt(252 if freq == 'D' else 252*78), len(dates))
+        n = len(dates)
+        returns = rng.normal(0, volatility/np.sqrt(252 if freq == 'D' else 252*78), n)
         log_returns = np.cumsum(returns)
-        prices = base_price * np.exp(log_returns)
+        closes = base_price * np.exp(log_returns)
         
-        # Generate OHLCV data
-        data = []
-        for i, (date, close) in enumerate(zip(dates, prices)):
-            # Generate realistic OHLC
-            open_price = close * (1 + np.random.normal(0, 0.001))
-            high_mult = 1 + abs(np.random.normal(0, 0.003))
-            low_mult = 1 - abs(np.random.normal(0, 0.003))
-            
-            high = max(open_price, close) * high_mult
-            low = min(open_price, close) * low_mult
-            
-            # Ensure OHLC consistency
-            high = max(high, open_price, close)
-            low = min(low, open_price, close)
-            
-            # Generate volume
-            if freq == 'D':
-                volume = int(np.random.lognormal(15, 0.5))  # Daily volume
-            else:
-                volume = int(np.random.lognormal(11, 0.8))  # Intraday volume
-            
-            data.append({
-                'datetime': date,
-                'open': round(open_price, 2),
-                'high': round(high, 2),
-                'low': round(low, 2),
-                'close': round(close, 2),
-                'volume': volume
-            })
+        # Generate OHLCV data - whole columns at once. The high/low
+        # multipliers are >= 1 / <= 1, so OHLC stays consistent
+        opens = closes * (1 + rng.normal(0, 0.001, n))
+        highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.003, n)))
+        lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.003, n)))
         
-        df = pd.DataFrame(data)
-        df.set_index('datetime', inplace=True)
+        if freq == 'D':
+            volumes = rng.lognormal(15, 0.5, n).astype(np.int32)  # Daily volume
+        else:
+            volumes = rng.lognormal(11, 0.8, n).astype(np.int32)  # Intraday volume
+        
+        # Round to paise in place - no extra arrays
+        for prices in (opens, highs, lows, closes):
+            np.round(prices, 2, out=prices)
+        
+        df = pd.DataFrame({
+            'open': opens,
+            'high': highs,
+            'low': lows,
+            'close': closes,
+            'volume': volumes
+        }, index=pd.DatetimeIndex(dates, name='datetime'), copy=False)
         
         print(f"Created {len(df)} bars of sample data")
         print(f"   Price range: ₹{df['close'].min():.2f} - ₹{df['close'].max():.2f}")
@@ -235,11 +307,9 @@ class ZerodhaData(bt.feeds.PandasData):
         if now.weekday() >= 5:  # Saturday = 5, Sunday = 6
             return False
         
-        # Check market hours (9:15 AM to 3:30 PM IST)
-        market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-        market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-        
-        return market_open <= now <= market_close
+        # Check market hours (9:15 AM to 3:30 PM IST) as minutes since midnight
+        minutes = now.hour * 60 + now.minute
+        return MARKET_OPEN_MINUTES <= minutes <= MARKET_CLOSE_MINUTES
     
     def _get_live_data(self):
         """Get live data from Zerodha API (for live feeds)"""
@@ -248,19 +318,17 @@ class ZerodhaData(bt.feeds.PandasData):
         
         try:
             # Get latest quote
-            quote = self.kite.quote([self.instrument_info['instrument_token']])
+            quote = self.kite.quote([self._token])
+            data = quote.get(self._token_str) if quote else None
             
-            if quote:
-                instrument_token = str(self.instrument_info['instrument_token'])
-                if instrument_token in quote:
-                    data = quote[instrument_token]
-                    return {
-                        'open': data['ohlc']['open'],
-                        'high': data['ohlc']['high'],
-                        'low': data['ohlc']['low'],
-                        'close': data['last_price'],
-                        'volume': data['volume']
-                    }
+            if data:
+                return {
+                    'open': data['ohlc']['open'],
+                    'high': data['ohlc']['high'],
+                    'low': data['ohlc']['low'],
+                    'close': data['last_price'],
+                    'volume': data['volume']
+                }
             
             return None
             
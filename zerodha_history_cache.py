@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+On-disk Parquet cache for Zerodha historical candles
+"""
+
+import hashlib
+import time
+from pathlib import Path
+import pandas as pd
+
+# One Parquet file per historical_data request
+HISTORICAL_CACHE_DIR = Path.home() / '.cache' / 'zerodha'
+HISTORICAL_CACHE_SECONDS = 24 * 60 * 60
+
+# Cache writes keep failing the same way (no pyarrow, read-only home) - say so once
+_write_warning_shown = False
+
+def cached_historical_data(kite, instrument_token, from_date, to_date, interval,
+                           max_age=HISTORICAL_CACHE_SECONDS, columns=None):
+    """
+    kite.historical_data() as a DataFrame, served from the Parquet cache when
+    a file for the same token, dates and interval is younger than max_age.
+    Pass columns to read only those fields back from the cache.
+    """
+    global _write_warning_shown
+    
+    key = f"{instrument_token}{from_date.date()}{to_date.date()}{interval}"
+    cache_file = HISTORICAL_CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.parquet"
+    
+    try:
+        if time.time() - cache_file.stat().st_mtime < max_age:
+            return pd.read_parquet(cache_file, columns=columns)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable cache file {cache_file}: {e}")
+    
+    df = pd.DataFrame(kite.historical_data(
+        instrument_token=instrument_token,
+        from_date=from_date,
+        to_date=to_date,
+        interval=interval
+    ))
+    
+    if not df.empty:
+        try:
+            HISTORICAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cache_file, compression='zstd')
+        except Exception as e:
+            if not _write_warning_shown:
+                _write_warning_shown = True
+                print(f"⚠️ Could not cache historical data, fetching without cache: {e}")
+    
+    return df if columns is None or df.empty else df[columns]